@@ -16,7 +16,10 @@ A simple GET request will return the page. We can then perform a lookup for all
 With this, we can extract the links to every news post. They are ordered by post date, so once we reach a news post that
 is outside of our time window, we can exit early.
 
-Another GET request on the identified links of interest will yield the relevant posts and their contents.
+Another GET request on the identified links of interest will yield the relevant posts and their contents. These requests
+are independent from one another, so they are all issued concurrently over a single shared aiohttp session, but their
+results are still looked at in the order of the cards. Posts that failed to load (or are too short) are skipped, while
+the first post that is too old ends the scan and cancels the requests still pending.
 
 Once the GET request returns on the link of the post, look for these elements:
 
@@ -29,12 +32,12 @@ Once the GET request returns on the link of the post, look for these elements:
 """
 import time
 import re
-import requests
+import asyncio
+import aiohttp
 import random
-from bs4 import BeautifulSoup
+from lxml import etree, html
 from typing import AsyncGenerator
-from datetime import datetime, timedelta
-import pytz
+from datetime import datetime, timedelta, timezone
 from exorde_data import (
     Item,
     Content,
@@ -47,7 +50,7 @@ from exorde_data import (
 import logging
 
 # GLOBAL VARIABLES
-USER_AGENT_LIST = [
+USER_AGENT_LIST = (
     'Mozilla/5.0 (iPad; CPU OS 12_2 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Mobile/15E148',
     'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/109.0.0.0 Safari/537.36',
     'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/109.0.0.0 Safari/537.36',
@@ -56,19 +59,61 @@ USER_AGENT_LIST = [
     'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/108.0.0.0 Safari/537.36',
     'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/16.1 Safari/605.1.15',
     'Mozilla/5.0 (Macintosh; Intel Mac OS X 13_1) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/16.1 Safari/605.1.15'
-]
+)
+_RNG = random.Random()
 DEFAULT_OLDNESS_SECONDS = 360
 DEFAULT_MAXIMUM_ITEMS = 25
 DEFAULT_MIN_POST_LENGTH = 10
 REGEX_PATTERN = r"^More on \w+(:)?$"
-
-
-def request_content_with_timeout(_url, _max_age):
+_MORE_ON_RE = re.compile(REGEX_PATTERN)
+# post dates look like "Jul. 18, 2023 8:13 AM ET"
+_DATE_RE = re.compile(r"^(\w{3})\.? (\d{1,2}), (\d{4}) (\d{1,2}):(\d{2}) (AM|PM)")
+_MONTHS = {
+    "Jan": 1, "Feb": 2, "Mar": 3, "Apr": 4, "May": 5, "Jun": 6,
+    "Jul": 7, "Aug": 8, "Sep": 9, "Oct": 10, "Nov": 11, "Dec": 12
+}
+
+# shared HTTP session, lazily created by query() so that its connection pool is reused across calls
+# a session can only be used from the event loop it was created in, so we keep track of that loop too
+_SESSION = None
+_SESSION_LOOP = None
+# bounds the number of post pages being fetched at the same time, like the session it is bound to one event loop
+MAX_CONCURRENT_REQUESTS = 8
+_SEM = None
+_SEM_LOOP = None
+
+# short-lived caches so that consecutive calls to query() don't scrape the same pages again
+# both map an url to a (timestamp, value) tuple
+CACHE_MAX_ENTRIES = 512
+POST_CACHE_TTL = 600
+LISTING_CACHE_TTL = 30
+_POST_CACHE = {}
+_LISTING_CACHE = {}
+# urls that recently failed (error status or network error), so that we don't keep requesting them
+NEGATIVE_CACHE_TTL = 300
+_NEG_CACHE = {}
+
+# precompiled lookups, evaluated directly against the lxml tree
+_XP_TITLE = etree.XPath('string(//h1[@data-test-id="post-title"])')
+_XP_DATE = etree.XPath('string(//span[@data-test-id="post-date"])')
+_XP_AUTHOR = etree.XPath('string(//span[@data-test-id="post-author-nick"])')
+# direct children of the content container, without the figures and the empty elements (h2 is kept, it marks the end)
+_XP_CONTAINER = etree.XPath(
+    '//div[@data-test-id="content-container"]/*[not(self::figure)][self::h2 or normalize-space()]')
+
+# returned instead of an Item when a post is outside of our time window, as opposed to None which means it failed
+TOO_OLD = object()
+
+
+async def request_content_with_timeout(_session, _headers, _url, _max_age, _min_length):
     """
     Returns all relevant information from the news post
+    :param _session: the aiohttp session used to perform the request
+    :param _headers: the headers to send along with the request
     :param _max_age: the maximum age we will allow for the post in seconds
+    :param _min_length: the minimum length of the content for the post to be returned
     :param _url: the url of the post
-    :return: the content of the post
+    :return: the content of the post, TOO_OLD if the post is outside of our time window, None if it could not be used
 
     <h1 data-test-id="post-title"/> ::  returns the title of the post
     <span data-test-id="post-date"/> :: returns the date of the post in this format: "Jul. 18, 2023 8:13 AM ET"
@@ -76,58 +121,129 @@ def request_content_with_timeout(_url, _max_age):
     <div data-test-id="content-container"/> :: the content of the post
         <p/> :: look for all directly-related p objects within the container to get the content (otherwise you'll get other things too)
     """
-    try:
-        response = requests.get(_url, headers={'User-Agent': random.choice(USER_AGENT_LIST)}, timeout=8.0)
-        soup = BeautifulSoup(response.text, 'html.parser')
+    if cache_get(_NEG_CACHE, _url, NEGATIVE_CACHE_TTL):
+        return None
 
-        post_date = convert_date_to_standard_format(soup.find("span", {"data-test-id": "post-date"}).text)
+    try:
+        cached_item = cache_get(_POST_CACHE, _url, POST_CACHE_TTL)
+        if cached_item:
+            # the post itself did not change, but it may have fallen out of our time window since it was cached
+            if not check_for_max_age(str(cached_item.created_at), _max_age):
+                return TOO_OLD
+            return cached_item if len(str(cached_item.content)) >= _min_length else None
+
+        async with get_semaphore():
+            async with _session.get(_url, headers=_headers) as response:
+                if not 200 <= response.status < 300:
+                    logging.info(f"[Seekingalpha] Got status {response.status} for {_url}, skipping it for a while")
+                    cache_put(_NEG_CACHE, _url, True, NEGATIVE_CACHE_TTL)
+                    return None
+                body = await response.read()
+        tree = html.fromstring(body)
+
+        post_date = convert_date_to_standard_format(_XP_DATE(tree))
         if not check_for_max_age(post_date, _max_age):
-            return None
+            return TOO_OLD
 
-        post_title = soup.find("h1", {"data-test-id": "post-title"}).text
-        author = soup.find("span", {"data-test-id": "post-author-nick"}).text.lstrip("By: ")
+        post_title = _XP_TITLE(tree)
+        author = extract_author(tree)
 
-        content_container = soup.find("div", {"data-test-id": "content-container"})
+        content_paragraphs = _XP_CONTAINER(tree)  # get all relevant direct children of the container
 
-        content_paragraphs = content_container.findChildren(recursive=False)  # get all children
-
-        content = ""
+        paragraphs = []
 
         for el in content_paragraphs:
-            if el.name == "h2":
+            if el.tag == "h2":
                 break  # end of the valuable content within the post
-            if not el.name == "figure" and el.text:
-                if re.match(REGEX_PATTERN, el.text):
-                    # make sure we remove the last bit "More on..." that sometimes stays
-                    break
-                content += el.text
-                content += "\n"
-
-        return Item(
+            text = el.text_content()
+            if _MORE_ON_RE.match(text):
+                # make sure we remove the last bit "More on..." that sometimes stays
+                break
+            paragraphs.append(text)
+
+        content = "\n".join(paragraphs) + "\n" if paragraphs else ""
+        if len(content) < _min_length:
+            return None  # too short to be of interest, don't bother building the item
+
+        item = Item(
             title=Title(post_title),
             content=Content(content),
+            author=Author(author),
             created_at=CreatedAt(post_date),
             url=Url(_url),
             domain=Domain("seekingalpha.com"))
+        cache_put(_POST_CACHE, _url, item, POST_CACHE_TTL)
+        return item
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        cache_put(_NEG_CACHE, _url, True, NEGATIVE_CACHE_TTL)
+        logging.exception(f"[Seekingalpha] Error : {e}")
     except Exception as e:
-        logging.exception("[Seekingalpha] Error : {e}")
+        # not the url's fault (e.g. the page did not parse), so it is not blacklisted
+        logging.exception(f"[Seekingalpha] Error : {e}")
 
 
-async def request_entries_with_timeout(_url, _max_age):
+async def request_entries_with_timeout(_session, _headers, _url, _max_age, _max_items, _min_length):
     """
     Extracts all card elements from the latest news section
+    :param _session: the aiohttp session used to perform the requests
+    :param _headers: the headers to send along with the requests
     :param _max_age: the maximum age we will allow for the post in seconds
+    :param _max_items: the maximum number of posts we will collect
+    :param _min_length: the minimum length of the content of the posts
     :param _url: the url where we will find the latest posts
     :return: the card elements from which we can extract the relevant information
     """
     try:
-        response = requests.get(_url, headers={'User-Agent': random.choice(USER_AGENT_LIST)}, timeout=8.0)
-        soup = BeautifulSoup(response.text, 'html.parser')
-        entries = soup.find_all("a", {"data-test-id": "post-list-item-title"})
-        async for item in parse_entry_for_elements(entries, _max_age):
+        entries = cache_get(_LISTING_CACHE, _url, LISTING_CACHE_TTL)
+        if entries is None:
+            async with _session.get(_url, headers=_headers) as response:
+                if not 200 <= response.status < 300:
+                    logging.info(f"[Seekingalpha] Got status {response.status} for the listing {_url}")
+                    return
+                entries = await read_post_links(response)
+            cache_put(_LISTING_CACHE, _url, entries, LISTING_CACHE_TTL)
+        async for item in parse_entry_for_elements(_session, _headers, entries, _max_age, _max_items, _min_length):
             yield item
     except Exception as e:
-        logging.exception("[Seekingalpha] Error : {e}")
+        logging.exception(f"[Seekingalpha] Error : {e}")
+
+
+async def read_post_links(_response):
+    """
+    Streams the listing page through an incremental parser and collects the links to the posts
+    Only the <a/> elements are looked at, and everything parsed up to them is dropped once their href is read
+    :param _response: the aiohttp response of the listing page
+    :return: the relative links to the posts, in the order of the page
+    """
+    links = []
+    parser = etree.HTMLPullParser(events=("end",), tag="a")
+
+    def collect():
+        for _, el in parser.read_events():
+            if el.get("data-test-id") == "post-list-item-title":
+                links.append(el.get("href"))
+            el.clear()
+            # whatever precedes this element (and its ancestors) is fully parsed already, so we can let go of it
+            # the root is left alone: its siblings (comments, processing instructions) have no parent to be removed from
+            for node in [el, *el.iterancestors()][:-1]:
+                while node.getprevious() is not None:
+                    del node.getparent()[0]
+
+    async for chunk in _response.content.iter_chunked(64 * 1024):
+        parser.feed(chunk)
+        collect()
+    parser.close()
+    collect()
+    return links
+
+
+def extract_author(_tree):
+    """
+    Reads the author's name from the post
+    :param _tree: the parsed page of the post
+    :return: the author's name, without the "By: " prefix
+    """
+    return _XP_AUTHOR(_tree).removeprefix("By: ").strip()
 
 
 def convert_date_to_standard_format(_date):
@@ -135,11 +251,15 @@ def convert_date_to_standard_format(_date):
     # date contains 6 elements [Month (abbreviated), Day Number, Year, Time, AM/PM, Timezone ET]
     # ET zone is 4 hours back from UTC + 0, we need to add 4 hours to this date time
 
-    # Remove the "ET" part from the input time string
-    cleaned_time = _date.replace(" ET", "")
+    # The format is fixed, so a regex is enough to pick it apart (and much cheaper than strptime)
+    match = _DATE_RE.match(_date)
+    if not match:
+        raise ValueError(f"Unexpected date format: {_date!r}")
+    month, day, year, hour, minute, am_pm = match.groups()
+    hour = int(hour) % 12 + (12 if am_pm == "PM" else 0)
 
     # Convert the input time string to a datetime object
-    datetime_obj = datetime.strptime(cleaned_time, "%b. %d, %Y %I:%M %p") + timedelta(hours=4)
+    datetime_obj = datetime(int(year), _MONTHS[month], int(day), hour, int(minute)) + timedelta(hours=4)
 
     # Convert the datetime object to the desired output format
     return datetime_obj.strftime("%Y-%m-%dT%H:%M:%S.00Z")
@@ -153,57 +273,122 @@ def check_for_max_age(_date, _max_age):
     :return: true if it is within the age bracket, false otherwise
     """
     date_to_check = datetime.strptime(_date, "%Y-%m-%dT%H:%M:%S.00Z")
-    now_time = datetime.strptime(datetime.strftime(datetime.now(pytz.utc), "%Y-%m-%dT%H:%M:%S.00Z"), "%Y-%m-%dT%H:%M:%S.00Z")
+    cutoff = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(seconds=_max_age)
 
-    if (now_time - date_to_check).total_seconds() <= _max_age:
-        return True
-    else:
-        return False
+    return date_to_check >= cutoff
 
 
-async def parse_entry_for_elements(_cards, _max_age):
+async def parse_entry_for_elements(_session, _headers, _cards, _max_age, _max_items, _min_length):
     """
-    Parses every card element to find the information we want
+    Fetches every post concurrently and yields them in the order of the cards, until one is too old
+    :param _session: The aiohttp session used to perform the requests
+    :param _headers: The headers to send along with the requests
     :param _max_age: The maximum age we will allow for the post in seconds
-    :param _cards: The parent card objects from which we will be gathering the information
+    :param _max_items: The maximum number of posts we will collect, only that many posts are fetched
+    :param _min_length: The minimum length of the content of the posts
+    :param _cards: The relative links to the posts, as extracted from the cards
     :return: All the parameters we need to return an Item instance
     """
+    tasks = [
+        asyncio.create_task(request_content_with_timeout(
+            _session, _headers, "https://seekingalpha.com" + card, _max_age, _min_length))
+        for card in _cards[:_max_items]  # cards are ordered by date, the first ones are the most recent
+    ]
     try:
-        for card in _cards:
-            item = request_content_with_timeout("https://seekingalpha.com" + card["href"], _max_age)
-            if item:
-                yield item
-            else:
+        for task in tasks:
+            item = await task
+            if item is TOO_OLD:
                 break  # if this item was not in the time bracket that interests us, the following ones will not be either
+            if item:  # posts that failed or were too short come back as None, the following ones may still be fine
+                yield item
     except Exception as e:
-        logging.exception("[Seekingalpha] Error : {e}")
+        logging.exception(f"[Seekingalpha] Error : {e}")
+    finally:
+        for task in tasks:
+            task.cancel()  # don't leave requests running for posts we won't look at
 
 
-def read_parameters(parameters):
-    # Check if parameters is not empty or None
-    if parameters and isinstance(parameters, dict):
-        try:
-            max_oldness_seconds = parameters.get("max_oldness_seconds", DEFAULT_OLDNESS_SECONDS)
-        except KeyError:
-            max_oldness_seconds = DEFAULT_OLDNESS_SECONDS
+def cache_get(_cache, _key, _ttl):
+    """
+    Looks up a value in one of the caches
+    :param _cache: the cache to look into
+    :param _key: the key of the value
+    :param _ttl: how long (in seconds) a value stays valid once cached
+    :return: the cached value, or None if it is missing or expired
+    """
+    entry = _cache.get(_key)
+    if entry and time.time() - entry[0] < _ttl:
+        return entry[1]
+    return None
 
-        try:
-            maximum_items_to_collect = parameters.get("maximum_items_to_collect", DEFAULT_MAXIMUM_ITEMS)
-        except KeyError:
-            maximum_items_to_collect = DEFAULT_MAXIMUM_ITEMS
 
-        try:
-            min_post_length = parameters.get("min_post_length", DEFAULT_MIN_POST_LENGTH)
-        except KeyError:
-            min_post_length = DEFAULT_MIN_POST_LENGTH
+def cache_put(_cache, _key, _value, _ttl):
+    """
+    Stores a value in one of the caches, evicting old entries if the cache is full
+    :param _cache: the cache to store the value into
+    :param _key: the key of the value
+    :param _value: the value to store
+    :param _ttl: how long (in seconds) a value stays valid once cached
+    """
+    now = time.time()
+    _cache.pop(_key, None)
+    if len(_cache) >= CACHE_MAX_ENTRIES:
+        for key in [key for key, (timestamp, _) in _cache.items() if now - timestamp >= _ttl]:
+            del _cache[key]
+        while len(_cache) >= CACHE_MAX_ENTRIES:
+            del _cache[next(iter(_cache))]  # entries are kept in insertion order, so this is the oldest one
+    _cache[_key] = (now, _value)
 
-    else:
-        # Assign default values if parameters is empty or None
-        max_oldness_seconds = DEFAULT_OLDNESS_SECONDS
-        maximum_items_to_collect = DEFAULT_MAXIMUM_ITEMS
-        min_post_length = DEFAULT_MIN_POST_LENGTH
 
-    return max_oldness_seconds, maximum_items_to_collect, min_post_length
+def get_session():
+    """
+    Returns the shared aiohttp session, creating it if needed (or if it belongs to another event loop)
+    :return: an open aiohttp.ClientSession bound to the running event loop
+    """
+    global _SESSION, _SESSION_LOOP
+    loop = asyncio.get_running_loop()
+    if _SESSION is None or _SESSION.closed or _SESSION_LOOP is not loop:
+        _SESSION_LOOP = loop
+        _SESSION = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=20, limit_per_host=MAX_CONCURRENT_REQUESTS, keepalive_timeout=30),
+            timeout=aiohttp.ClientTimeout(total=8),
+            headers={"Accept-Encoding": "br, gzip, deflate"})  # brotli is decoded by aiohttp through the Brotli package
+    return _SESSION
+
+
+def get_semaphore():
+    """
+    Returns the semaphore bounding the concurrent post requests, creating it if needed
+    :return: an asyncio.Semaphore bound to the running event loop
+    """
+    global _SEM, _SEM_LOOP
+    loop = asyncio.get_running_loop()
+    if _SEM is None or _SEM_LOOP is not loop:
+        _SEM_LOOP = loop
+        _SEM = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+    return _SEM
+
+
+async def close_session():
+    """
+    Closes the shared aiohttp session, should be awaited before the event loop that uses it is shut down
+    """
+    global _SESSION, _SESSION_LOOP
+    if _SESSION is not None and not _SESSION.closed and _SESSION_LOOP is asyncio.get_running_loop():
+        await _SESSION.close()
+    _SESSION = None
+    _SESSION_LOOP = None
+
+
+def read_parameters(parameters):
+    # Fall back on the default values for anything missing (or if parameters is empty or None)
+    parameters = parameters if isinstance(parameters, dict) else {}
+
+    return (
+        parameters.get("max_oldness_seconds", DEFAULT_OLDNESS_SECONDS),
+        parameters.get("maximum_items_to_collect", DEFAULT_MAXIMUM_ITEMS),
+        parameters.get("min_post_length", DEFAULT_MIN_POST_LENGTH)
+    )
 
 
 async def query(parameters: dict) -> AsyncGenerator[Item, None]:
@@ -212,7 +397,12 @@ async def query(parameters: dict) -> AsyncGenerator[Item, None]:
     max_oldness_seconds, maximum_items_to_collect, min_post_length = read_parameters(parameters)
     logging.info(f"[Seeking Alpha] - Scraping items posted less than {max_oldness_seconds} seconds ago.")
 
-    async for item in request_entries_with_timeout(url_main_endpoint, max_oldness_seconds):
+    session = get_session()
+    # one user agent for the whole run, sent per request since the session is shared with other runs
+    headers = {"User-Agent": _RNG.choice(USER_AGENT_LIST)}
+
+    async for item in request_entries_with_timeout(
+            session, headers, url_main_endpoint, max_oldness_seconds, maximum_items_to_collect, min_post_length):
         yielded_items += 1
         yield item
         logging.info(f"[Seeking Alpha] Found new post :\t {item.title}, posted at { item.created_at}, URL = {item.url}" )
@@ -7,7 +7,8 @@ setup(
     install_requires=[
         "exorde_data",
         "aiohttp",
-        "beautifulsoup4>=4.11"
+        "lxml",
+        "Brotli"
     ],
     extras_require={"dev": ["pytest", "pytest-cov", "pytest-asyncio"]},
 )
@@ -0,0 +1,136 @@
+import seekingalphad89ba32s
+from seekingalphad89ba32s import (
+    parse_entry_for_elements,
+    convert_date_to_standard_format,
+    extract_author,
+    read_post_links,
+    request_content_with_timeout,
+    cache_get,
+    cache_put,
+    TOO_OLD,
+)
+from exorde_data import Item, Content, CreatedAt, Title, Url, Domain
+from lxml import html
+import pytest
+
+
+@pytest.mark.asyncio
+async def test_parse_entry_for_elements_skips_failures_and_stops_when_too_old(monkeypatch):
+    first, second, third = object(), object(), object()
+    results = {"/0": first, "/1": None, "/2": second, "/3": TOO_OLD, "/4": third}
+
+    async def fake_request_content_with_timeout(_session, _headers, _url, _max_age, _min_length):
+        return results[_url.removeprefix("https://seekingalpha.com")]
+
+    monkeypatch.setattr(seekingalphad89ba32s, "request_content_with_timeout", fake_request_content_with_timeout)
+
+    items = [item async for item in parse_entry_for_elements(None, {}, list(results), 360, 25, 10)]
+    assert items == [first, second]
+
+
+@pytest.mark.parametrize("date, expected", [
+    ("Jul. 18, 2023 8:13 AM ET", "2023-07-18T12:13:00.00Z"),
+    ("May 3, 2023 12:05 AM ET", "2023-05-03T04:05:00.00Z"),
+    ("Jul. 18, 2023 12:30 PM ET", "2023-07-18T16:30:00.00Z"),
+    ("Dec. 31, 2023 11:59 PM ET", "2024-01-01T03:59:00.00Z"),
+])
+def test_convert_date_to_standard_format(date, expected):
+    assert convert_date_to_standard_format(date) == expected
+
+
+def test_convert_date_to_standard_format_rejects_unknown_format():
+    with pytest.raises(ValueError):
+        convert_date_to_standard_format("2023-07-18 08:13")
+
+
+def test_extract_author_only_removes_the_prefix():
+    tree = html.fromstring('<html><body><span data-test-id="post-author-nick">By: Bryan</span></body></html>')
+    assert extract_author(tree) == "Bryan"
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(seekingalphad89ba32s.time, "time", lambda: now[0])
+    return now
+
+
+def test_cache_entries_expire_after_ttl(clock):
+    cache = {}
+    cache_put(cache, "key", "value", 30)
+    clock[0] += 29
+    assert cache_get(cache, "key", 30) == "value"
+    clock[0] += 1
+    assert cache_get(cache, "key", 30) is None
+
+
+def test_cache_evicts_oldest_entry_when_full(clock, monkeypatch):
+    monkeypatch.setattr(seekingalphad89ba32s, "CACHE_MAX_ENTRIES", 3)
+    cache = {}
+    for key in ("a", "b", "c"):
+        cache_put(cache, key, key, 100)
+        clock[0] += 1
+    cache_put(cache, "b", "b", 100)  # refreshing an entry evicts nothing, it just becomes the most recent one
+    assert list(cache) == ["a", "c", "b"]
+    cache_put(cache, "d", "d", 100)
+    assert list(cache) == ["c", "b", "d"]
+
+
+def test_cache_evicts_all_expired_entries_when_full(clock, monkeypatch):
+    monkeypatch.setattr(seekingalphad89ba32s, "CACHE_MAX_ENTRIES", 3)
+    cache = {}
+    cache_put(cache, "a", "a", 40)
+    clock[0] += 1
+    cache_put(cache, "b", "b", 40)
+    clock[0] += 49
+    cache_put(cache, "c", "c", 40)
+    cache_put(cache, "d", "d", 40)
+    assert list(cache) == ["c", "d"]
+
+
+@pytest.mark.asyncio
+async def test_cached_post_out_of_the_time_window_is_too_old(monkeypatch):
+    monkeypatch.setattr(seekingalphad89ba32s, "_POST_CACHE", {})
+    monkeypatch.setattr(seekingalphad89ba32s, "_NEG_CACHE", {})
+    url = "https://seekingalpha.com/news/1"
+    item = Item(
+        title=Title("Some news"),
+        content=Content("Some content long enough"),
+        created_at=CreatedAt("2023-07-18T12:13:00.00Z"),
+        url=Url(url),
+        domain=Domain("seekingalpha.com"))
+    cache_put(seekingalphad89ba32s._POST_CACHE, url, item, seekingalphad89ba32s.POST_CACHE_TTL)
+
+    # the session is never used, the post comes from the cache
+    assert await request_content_with_timeout(None, {}, url, 360, 10) is TOO_OLD
+    assert await request_content_with_timeout(None, {}, url, 10 ** 10, 10) is item
+
+
+class FakeListingResponse:
+    """
+    Mimics the part of an aiohttp response read by read_post_links, serving the page in chunks
+    """
+    def __init__(self, body, chunk_size):
+        self.body = body
+        self.chunk_size = chunk_size
+        self.content = self
+
+    async def iter_chunked(self, _size):
+        for start in range(0, len(self.body), self.chunk_size):
+            yield self.body[start:start + self.chunk_size]
+
+
+LISTING_PAGE = b"""<html><head><title>Market News</title></head><body>
+<a href="/market-news">Market News</a>
+<ul>""" + b"".join(
+    b'''<li><article><h3><a data-test-id="post-list-item-title" href="/news/%d"><span>Post %d</span></a></h3>
+<a href="/symbol/AAPL">AAPL</a></article></li>''' % (i, i) for i in range(20)
+) + b"""</ul><footer><a href="/about">About</a></footer></body></html>"""
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("prologue", [b"", b"<!DOCTYPE html><!-- build abc -->", b'<?xml version="1.0"?>'])
+@pytest.mark.parametrize("chunk_size", [1, 7, 64, 1 << 20])
+async def test_read_post_links_returns_the_post_links_in_page_order(prologue, chunk_size):
+    links = await read_post_links(FakeListingResponse(prologue + LISTING_PAGE, chunk_size))
+    assert links == [f"/news/{i}" for i in range(20)]
@@ -1,4 +1,4 @@
-from seekingalphad89ba32s import query
+from seekingalphad89ba32s import query, close_session
 from exorde_data.models import Item
 import pytest
 
@@ -12,6 +12,7 @@ async def test_query():
     }
     async for item in query(params):
         assert isinstance(item, Item)
+    await close_session()
 
 import asyncio
 asyncio.run(test_query())
\ No newline at end of file